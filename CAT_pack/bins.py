@@ -1,8 +1,6 @@
 #!/usr/bin/env python3
 
 import argparse
-import decimal
-import multiprocessing
 import os
 import sys
 
@@ -27,8 +25,8 @@ def parse_arguments():
 
     optional = parser.add_argument_group("Optional arguments")
     shared.add_argument(optional, "bin_suffix", False, default=".fna")
-    shared.add_argument(optional, "r", False, default=decimal.Decimal(5))
-    shared.add_argument(optional, "f", False, default=decimal.Decimal(0.3))
+    shared.add_argument(optional, "r", False, default=5.0)
+    shared.add_argument(optional, "f", False, default=0.3)
     shared.add_argument(optional, "out_prefix", False, default="./out.BAT")
     shared.add_argument(
         optional,
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import argparse
-import decimal
 import sys
 
 import about
@@ -24,8 +23,8 @@ def parse_arguments():
     shared.add_argument(required, "taxonomy_folder", True)
 
     optional = parser.add_argument_group("Optional arguments")
-    shared.add_argument(optional, "r", False, default=decimal.Decimal(10))
-    shared.add_argument(optional, "f", False, default=decimal.Decimal(0.5))
+    shared.add_argument(optional, "r", False, default=10.0)
+    shared.add_argument(optional, "f", False, default=0.5)
     shared.add_argument(optional, "out_prefix", False, default="./out.CAT")
     shared.add_argument(optional, "proteins_fasta", False)
     shared.add_argument(optional, "alignment_file", False)
@@ -2,7 +2,6 @@
 
 import argparse
 import datetime
-import multiprocessing
 import os
 import pathlib
 import shutil
@@ -53,8 +52,7 @@ def parse_arguments():
     shared.add_argument(optional, "help", False)
 
     specific = parser.add_argument_group("DIAMOND specific optional arguments")
-    shared.add_argument(
-        specific, "nproc", False, default=multiprocessing.cpu_count())
+    shared.add_argument(specific, "nproc", False)
 
     (args, extra_args) = parser.parse_known_args()
 
@@ -4,7 +4,6 @@ import argparse
 import datetime
 import decimal
 import gzip
-import multiprocessing
 import os
 import pathlib
 import subprocess
@@ -12,6 +11,11 @@ import sys
 
 import check
 
+# Allowed values of the r, f, and top parameters, built once at import.
+_R_CHOICES = tuple(range(101))
+_F_CHOICES = tuple(i / 100 for i in range(100))
+_TOP_CHOICES = tuple(range(101))
+
 
 class PathAction(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
@@ -26,11 +30,6 @@ class PathAction(argparse.Action):
         setattr(namespace, self.dest, path)
 
 
-class DecimalAction(argparse.Action):
-    def __call__(self, parser, namespace, values, option_string=None):
-        setattr(namespace, self.dest, decimal.Decimal(values))
-
-
 class SuffixAction(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
         bin_suffix = ".{0}".format(values.lstrip("."))
@@ -38,6 +37,15 @@ class SuffixAction(argparse.Action):
         setattr(namespace, self.dest, bin_suffix)
 
 
+def existing_path(path):
+    path = os.path.expanduser(path)
+
+    if not os.path.exists(path):
+        raise argparse.ArgumentTypeError("can not find {0}.".format(path))
+
+    return path
+
+
 def timestamp():
     now = datetime.datetime.now()
     str_ = "[{0}]".format(now.strftime("%Y-%m-%d %H:%M:%S"))
@@ -80,7 +88,7 @@ def add_argument(argument_group, dest, required, default=None, help_=None):
             dest="bin_fasta",
             metavar="",
             required=required,
-            type=str,
+            type=existing_path,
             action=PathAction,
             help=help_,
         )
@@ -119,7 +127,7 @@ def add_argument(argument_group, dest, required, default=None, help_=None):
             dest="database_folder",
             metavar="",
             required=required,
-            type=str,
+            type=existing_path,
             action=PathAction,
             default=default,
             help=help_,
@@ -133,7 +141,7 @@ def add_argument(argument_group, dest, required, default=None, help_=None):
             dest="taxonomy_folder",
             metavar="",
             required=required,
-            type=str,
+            type=existing_path,
             action=PathAction,
             default=default,
             help=help_,
@@ -212,8 +220,7 @@ def add_argument(argument_group, dest, required, default=None, help_=None):
             metavar="",
             required=required,
             type=float,
-            choices=[i for i in range(101)],
-            action=DecimalAction,
+            choices=_R_CHOICES,
             default=default,
             help=help_,
         )
@@ -228,8 +235,7 @@ def add_argument(argument_group, dest, required, default=None, help_=None):
             metavar="",
             required=required,
             type=float,
-            choices=[i / 100 for i in range(0, 100)],
-            action=DecimalAction,
+            choices=_F_CHOICES,
             default=default,
             help=help_,
         )
@@ -284,7 +290,7 @@ def add_argument(argument_group, dest, required, default=None, help_=None):
             dest="proteins_fasta",
             metavar="",
             required=required,
-            type=str,
+            type=existing_path,
             action=PathAction,
             help=help_,
         )
@@ -302,7 +308,7 @@ def add_argument(argument_group, dest, required, default=None, help_=None):
             dest="alignment_file",
             metavar="",
             required=required,
-            type=str,
+            type=existing_path,
             action=PathAction,
             help=help_,
         )
@@ -574,7 +580,7 @@ def add_argument(argument_group, dest, required, default=None, help_=None):
             metavar="",
             required=required,
             type=float,
-            choices=[i for i in range(101)],
+            choices=_TOP_CHOICES,
             default=default,
             help=help_,
         )
@@ -585,9 +591,7 @@ def add_argument(argument_group, dest, required, default=None, help_=None):
 
 
 def add_all_diamond_arguments(argument_group):
-    add_argument(
-        argument_group, "nproc", False, default=multiprocessing.cpu_count()
-    )
+    add_argument(argument_group, "nproc", False)
     add_argument(argument_group, "sensitive", False)
     add_argument(argument_group, "no_self_hits", False)
     add_argument(argument_group, "block_size", False, default=12.0)
@@ -601,7 +605,13 @@ def add_all_diamond_arguments(argument_group):
 
 def expand_arguments(args):
     if "r" in args:
-        setattr(args, "one_minus_r", (100 - args.r) / 100)
+        # Kept as a decimal so that the bit-score cutoff is exact.
+        setattr(
+            args, "one_minus_r", decimal.Decimal(100 - args.r) / 100)
+
+    if "nproc" in args and args.nproc is None:
+        # Use all cores by default.
+        setattr(args, "nproc", os.cpu_count() or 1)
 
     log_file = None
     if "out_prefix" in args:
@@ -922,7 +932,7 @@ def import_contig_names(fasta_file, log_file, quiet):
     with open(fasta_file, "r") as f1:
         for line in f1:
             if line.startswith(">"):
-                contig = line.split()[0].lstrip(">").rstrip()
+                contig = sys.intern(line.split()[0].lstrip(">").rstrip())
 
                 if contig in contig_names:
                     message = (
@@ -950,8 +960,8 @@ def import_ORFs(proteins_fasta, log_file, quiet):
             line = line.rstrip()
 
             if line.startswith(">"):
-                ORF = line.split()[0].lstrip(">")
-                contig = ORF.rsplit("_", 1)[0]
+                ORF = sys.intern(line.split()[0].lstrip(">"))
+                contig = sys.intern(ORF.rsplit("_", 1)[0])
 
                 if contig not in contig2ORFs:
                     contig2ORFs[contig] = []
@@ -990,17 +1000,19 @@ def parse_tabular_alignment(alignment_file, one_minus_r, log_file, quiet):
 
         if not line[0] == ORF:
             # A new ORF is reached.
-            ORF = line[0]
-            top_bitscore = decimal.Decimal(line[11])
+            ORF = sys.intern(line[0])
+            # The cutoff is calculated in exact decimal arithmetic and only
+            # then converted, so that hits exactly at the cutoff are included.
+            min_bitscore = float(one_minus_r * decimal.Decimal(line[11]))
             ORF2hits[ORF] = []
 
             ORF_done = False
 
-        bitscore = decimal.Decimal(line[11])
+        bitscore = float(line[11])
 
-        if bitscore >= one_minus_r * top_bitscore:
+        if bitscore >= min_bitscore:
             # The hit has a high enough bit-score to be included.
-            hit = line[1]
+            hit = sys.intern(line[1])
 
             ORF2hits[ORF].append(
                 (hit, bitscore),)
@@ -1,8 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
-import decimal
-import multiprocessing
+import os
 import sys
 
 import about
@@ -24,8 +23,8 @@ def parse_arguments():
     shared.add_argument(required, "taxonomy_folder", True)
 
     optional = parser.add_argument_group("Optional arguments")
-    shared.add_argument(optional, "r", False, default=decimal.Decimal(5))
-    shared.add_argument(optional, "f", False, default=decimal.Decimal(0.3))
+    shared.add_argument(optional, "r", False, default=5.0)
+    shared.add_argument(optional, "f", False, default=0.3)
     shared.add_argument(optional, "out_prefix", False, default="./out.BAT")
     shared.add_argument(optional, "proteins_fasta", False)
     shared.add_argument(optional, "alignment_file", False)
@@ -50,6 +49,13 @@ def parse_arguments():
     if len(extra_args) > 0:
         sys.exit("error: too much arguments supplied:\n{0}".format(
             "\n".join(extra_args)))
+
+    if args.alignment_file and not args.proteins_fasta:
+        sys.exit(
+            "error: if you want BAT to directly classify a single bin, you "
+            "should not only supply an alignment table but also a predicted "
+            "protein fasta file with argument [-p / --proteins]."
+        )
         
     # Check experimental features.
     if not args.IkwId:
@@ -74,6 +80,47 @@ def parse_arguments():
     return args
 
 
+# Data shared with the processes that classify ORFs, set by
+# init_ORF_classification. A pool is only used if the fork start method is
+# available, where it is inherited without copying. With spawn it would be
+# pickled into every worker, which costs more than it saves.
+_ORF_classification_data = None
+
+# Minimum number of ORFs with hits before classifying them in parallel pays
+# off the cost of starting the worker processes.
+_MIN_ORFS_FOR_POOL = 10000
+
+
+def init_ORF_classification(ORF2hits, fastaid2LCAtaxid, taxid2parent):
+    global _ORF_classification_data
+
+    _ORF_classification_data = (ORF2hits, fastaid2LCAtaxid, taxid2parent)
+
+    return
+
+
+def classify_ORFs(ORFs):
+    (ORF2hits, fastaid2LCAtaxid, taxid2parent) = _ORF_classification_data
+    find_LCA_for_ORF = tax.find_LCA_for_ORF
+
+    ORF_LCAs = []
+    for ORF in ORFs:
+        hits = ORF2hits.get(ORF)
+
+        if hits is None:
+            ORF_LCAs.append(None)
+
+            continue
+
+        (taxid,
+                top_bitscore) = find_LCA_for_ORF(
+            hits, fastaid2LCAtaxid, taxid2parent)
+
+        ORF_LCAs.append((len(hits), taxid, top_bitscore),)
+
+    return ORF_LCAs
+
+
 def run():
     args = parse_arguments()
 
@@ -113,16 +160,6 @@ def run():
         )
         shared.give_user_feedback(
             message, args.log_file, args.quiet, show_time=False)
-    elif not args.proteins_fasta and args.alignment_file:
-        message = (
-            "if you want BAT to directly classify a single bin, you should "
-            "not only supply an alignment table but also a predicted protein "
-            "fasta file with argument [-p / --proteins]."
-        )
-        shared.give_user_feedback(
-            message, args.log_file, args.quiet, error=True)
-
-        sys.exit(1)
 
     step_list.append("classify")
 
@@ -302,127 +339,167 @@ def run():
 
     n_classified_bins = 0
 
-    with open(args.bin2classification_output_file, "w") as outf1, open(args.ORF2LCA_output_file, "w") as outf2:
-        outf1.write("# bin\tclassification\treason\tlineage\tlineage scores\n")
+    # ORFs are classified per contig, in parallel for large bins if multiple
+    # cores are available and processes are forked. The order of the contigs
+    # is kept for the output.
+    contigs_ORFs = sorted(contig2ORFs.items())
+    ORF_classification_data = (ORF2hits, fastaid2LCAtaxid, taxid2parent)
+
+    fork_context = None
+    if args.nproc > 1 and len(ORF2hits) >= _MIN_ORFS_FOR_POOL:
+        import multiprocessing
+
+        # Request fork explicitly rather than relying on (and fixing) the
+        # default start method, which is not fork on all platforms.
+        if "fork" in multiprocessing.get_all_start_methods():
+            fork_context = multiprocessing.get_context("fork")
+
+    if fork_context is not None:
+        chunksize = max(1, len(contigs_ORFs) // (args.nproc * 4))
+
+        with fork_context.Pool(
+                args.nproc,
+                initializer=init_ORF_classification,
+                initargs=ORF_classification_data) as pool:
+            contigs_ORF_LCAs = pool.map(
+                classify_ORFs,
+                [ORFs for (contig, ORFs) in contigs_ORFs],
+                chunksize=chunksize
+            )
+    else:
+        init_ORF_classification(*ORF_classification_data)
+
+        contigs_ORF_LCAs = [classify_ORFs(ORFs) for
+                            (contig, ORFs) in contigs_ORFs]
+
+    # Resolve per-ORF functions once, outside of the output loop.
+    find_lineage = tax.find_lineage
+
+    if args.no_stars:
+        def star_lineage(lineage, taxids_with_multiple_offspring):
+            return lineage
+    else:
+        star_lineage = tax.star_lineage
+
+    # Output is written as bytes through a large buffer, which avoids the
+    # text layer and many small writes for bins with a lot of ORFs.
+    with open(args.bin2classification_output_file, "wb",
+              buffering=1 << 20) as outf1, open(
+                  args.ORF2LCA_output_file, "wb", buffering=1 << 20) as outf2:
+        outf1.write(b"# bin\tclassification\treason\tlineage\tlineage scores\n")
 
-        outf2.write("# ORF\tbin\tnumber of hits\tlineage\ttop bit-score\n")
+        outf2.write(b"# ORF\tbin\tnumber of hits\tlineage\ttop bit-score\n")
 
-        # The list contains only a single bin, but I keep the code like this
-        # to make the code consistent across bin and bins.
-        bin_list = [args.bin_fasta.rsplit("/", 1)[-1]]
-        for bin_ in bin_list:
-            LCAs_ORFs = []
+        bin_ = os.path.basename(args.bin_fasta)
+
+        LCAs_ORFs = []
+        total_n_ORFs = 0
+
+        # Many ORFs share the same LCA, so the (starred) lineage string is
+        # only constructed once per taxid.
+        taxid2lineage_str = {}
+        
+        # All contigs with ORFs are in the bin (checked above), so there is
+        # no need to go over contigs without ORFs.
+        for ((contig, ORFs), ORF_LCAs) in zip(contigs_ORFs, contigs_ORF_LCAs):
+            total_n_ORFs += len(ORFs)
+
+            ORF_lines = []
             
-            for contig in sorted(contig_names):
-                if contig not in contig2ORFs:
+            for (ORF, ORF_LCA) in zip(ORFs, ORF_LCAs):
+                if ORF_LCA is None:
+                    ORF_lines.append(
+                        "{0}\t{1}\tORF has no hit to database\n"
+                        "".format(ORF, bin_).encode())
+                    
                     continue
-                
-                for ORF in contig2ORFs[contig]:
-                    if ORF not in ORF2hits:
-                        outf2.write("{0}\t{1}\tORF has no hit to database\n"
-                                    "".format(ORF, bin_))
-                        
-                        continue
-
-                    n_hits = len(ORF2hits[ORF])
-
-                    (taxid,
-                            top_bitscore) = tax.find_LCA_for_ORF(
-                        ORF2hits[ORF], fastaid2LCAtaxid, taxid2parent)
-                     
-                    if taxid.startswith("no taxid found"):
-                        outf2.write("{0}\t{1}\t{2}\t{3}\t{4}\n".format(
-                            ORF, bin_, n_hits, taxid, top_bitscore))
-                    else:
-                        lineage = tax.find_lineage(taxid, taxid2parent)
-
-                        if not args.no_stars:
-                            lineage = tax.star_lineage(
-                                lineage, taxids_with_multiple_offspring)
-                        
-                        outf2.write("{0}\t{1}\t{2}\t{3}\t{4}\n".format(
-                            ORF,
-                            bin_,
-                            n_hits,
-                            ";".join(lineage[::-1]),
-                            top_bitscore
-                        ))
-                                    
-                    LCAs_ORFs.append((taxid, top_bitscore),)
+
+                (n_hits, taxid, top_bitscore) = ORF_LCA
+                 
+                if taxid.startswith("no taxid found"):
+                    lineage_str = taxid
+                elif taxid in taxid2lineage_str:
+                    lineage_str = taxid2lineage_str[taxid]
+                else:
+                    lineage = star_lineage(
+                        find_lineage(taxid, taxid2parent),
+                        taxids_with_multiple_offspring
+                    )
+
+                    lineage_str = ";".join(reversed(lineage))
+                    taxid2lineage_str[taxid] = lineage_str
                     
-            if len(LCAs_ORFs) == 0:
-                outf1.write("{0}\tno taxid assigned\tno hits to database\n"
-                            "".format(bin_))
+                ORF_lines.append("{0}\t{1}\t{2}\t{3}\t{4}\n".format(
+                    ORF, bin_, n_hits, lineage_str, top_bitscore
+                ).encode())
+                                
+                LCAs_ORFs.append((taxid, top_bitscore),)
 
-                continue
-            
+            outf2.writelines(ORF_lines)
+                
+        if len(LCAs_ORFs) == 0:
+            outf1.write("{0}\tno taxid assigned\tno hits to database\n"
+                        "".format(bin_).encode())
+        else:
             (lineages,
                     lineages_scores,
                     based_on_n_ORFs) = tax.find_weighted_LCA(
                 LCAs_ORFs, taxid2parent, args.f)
-             
+
             if lineages == "no ORFs with taxids found.":
                 outf1.write("{0}\tno taxid assigned\t"
-                            "hits not found in taxonomy files\n".format(bin_))
-
-                continue
-            
-            if lineages == "no lineage whitelisted.":
+                            "hits not found in taxonomy files\n"
+                            "".format(bin_).encode())
+            elif lineages == "no lineage whitelisted.":
                 outf1.write(
                     "{0}\tno taxid assigned\t"
                     "no lineage reached minimum bit-score support\n"
-                    "".format(bin_)
+                    "".format(bin_).encode()
                 )
-
-                continue
-            
-            # The bin has a valid classification.
-            n_classified_bins += 1
+            else:
+                # The bin has a valid classification.
+                n_classified_bins += 1
+        
+                for (i, lineage) in enumerate(lineages):
+                    lineage = star_lineage(
+                        lineage, taxids_with_multiple_offspring)
             
-            total_n_ORFs = sum(
-                [len(contig2ORFs[contig]) for
-                 contig in contig_names if contig in contig2ORFs]
-            )
+                    scores_str = ";".join(
+                        "{0:.2f}".format(score) for
+                        score in reversed(lineages_scores[i])
+                    )
             
-            for (i, lineage) in enumerate(lineages):
-                if not args.no_stars:
-                    lineage = tax.star_lineage(
-                        lineage, taxids_with_multiple_offspring)
-                
-                scores = ["{0:.2f}".format(score) for
-                          score in lineages_scores[i]]
-                
-                if len(lineages) == 1:
-                    # There is only one classification.
-                    outf1.write(
-                        "{0}\t"
-                        "taxid assigned\t"
-                        "based on {1}/{2} ORFs\t"
-                        "{3}\t"
-                        "{4}\n".format(
-                            bin_,
-                            based_on_n_ORFs,
-                            total_n_ORFs,
-                            ";".join(lineage[::-1]),
-                            ";".join(scores[::-1])))
-                else:
-                    # There are multiple classifications.
-                    outf1.write(
-                        "{0}\t"
-                        "taxid assigned ({1}/{2})\t"
-                        "based on {3}/{4} ORFs\t"
-                        "{5}\t"
-                        "{6}\n".format(
-                            bin_,
-                            i + 1,
-                            len(lineages),
-                            based_on_n_ORFs,
-                            total_n_ORFs,
-                            ";".join(lineage[::-1]),
-                            ";".join(scores[::-1])
+                    if len(lineages) == 1:
+                        # There is only one classification.
+                        outf1.write(
+                            "{0}\t"
+                            "taxid assigned\t"
+                            "based on {1}/{2} ORFs\t"
+                            "{3}\t"
+                            "{4}\n".format(
+                                bin_,
+                                based_on_n_ORFs,
+                                total_n_ORFs,
+                                ";".join(reversed(lineage)),
+                                scores_str).encode())
+                    else:
+                        # There are multiple classifications.
+                        outf1.write(
+                            "{0}\t"
+                            "taxid assigned ({1}/{2})\t"
+                            "based on {3}/{4} ORFs\t"
+                            "{5}\t"
+                            "{6}\n".format(
+                                bin_,
+                                i + 1,
+                                len(lineages),
+                                based_on_n_ORFs,
+                                total_n_ORFs,
+                                ";".join(reversed(lineage)),
+                                scores_str
+                            ).encode()
                         )
-                    )
-                                   
+                               
     message = ("\n-----------------\n"
                "{0} BAT is done! {1}/1 bin has taxonomy assigned.".format(
                    shared.timestamp(), n_classified_bins))
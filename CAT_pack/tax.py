@@ -16,8 +16,8 @@ def import_nodes(nodes_dmp, log_file, quiet):
         for line in f1:
             line = line.split("\t")
 
-            taxid = line[0]
-            parent = line[2]
+            taxid = sys.intern(line[0])
+            parent = sys.intern(line[2])
             rank = line[4]
 
             taxid2parent[taxid] = parent
@@ -57,7 +57,7 @@ def import_fastaid2LCAtaxid(fastaid2LCAtaxid_file, all_hits, log_file, quiet):
 
             if line[0] in all_hits:
                 # Only include fastaids that are found in hits.
-                fastaid2LCAtaxid[line[0]] = line[1]
+                fastaid2LCAtaxid[sys.intern(line[0])] = sys.intern(line[1])
 
     return fastaid2LCAtaxid
 
@@ -84,10 +84,15 @@ def find_lineage(taxid, taxid2parent, lineage=None):
 
     lineage.append(taxid)
 
-    if taxid2parent[taxid] == taxid:
-        return lineage
-    else:
-        return find_lineage(taxid2parent[taxid], taxid2parent, lineage)
+    # Walk up to the root, which is its own parent.
+    parent = taxid2parent[taxid]
+    while parent != taxid:
+        taxid = parent
+        lineage.append(taxid)
+
+        parent = taxid2parent[taxid]
+
+    return lineage
     
     
 def find_LCA(list_of_lineages):
@@ -99,33 +104,46 @@ def find_LCA(list_of_lineages):
 
 
 def find_LCA_for_ORF(hits, fastaid2LCAtaxid, taxid2parent):
-    list_of_lineages = []
     top_bitscore = 0
+    LCA_lineage = None
+    seen_taxids = set()
 
     for (hit, bitscore) in hits:
         if bitscore > top_bitscore:
             top_bitscore = bitscore
-            
+
         try:
             taxid = fastaid2LCAtaxid[hit]
-            lineage = find_lineage(taxid, taxid2parent)
 
-            list_of_lineages.append(lineage)
-        except:
+            if taxid in seen_taxids:
+                continue
+
+            if LCA_lineage is None:
+                LCA_lineage = find_lineage(taxid, taxid2parent)
+                LCA_taxids = set(LCA_lineage)
+            else:
+                # Only climb until the lineage of the current LCA is met, the
+                # taxids above that are shared anyway.
+                ancestor = taxid
+                while ancestor not in LCA_taxids:
+                    ancestor = taxid2parent[ancestor]
+
+                if ancestor != LCA_lineage[0]:
+                    LCA_lineage = LCA_lineage[LCA_lineage.index(ancestor):]
+                    LCA_taxids = set(LCA_lineage)
+
+            seen_taxids.add(taxid)
+        except KeyError:
             # The fastaid does not have an associated taxid for some reason.
             pass
         
-    if len(list_of_lineages) == 0:
+    if LCA_lineage is None:
         return (
             "no taxid found ({0})".format(";".join([i[0] for i in hits])),
             top_bitscore
         )
 
-    overlap = set.intersection(*map(set, list_of_lineages))
-
-    for taxid in list_of_lineages[0]:
-        if taxid in overlap:
-            return (taxid, top_bitscore)
+    return (LCA_lineage[0], top_bitscore)
         
         
 def find_questionable_taxids(lineage, taxids_with_multiple_offspring):